@@ -0,0 +1,96 @@
+from provider import config, w3, async_w3
+from deploy import get_artifact, print_deployment
+from nonces import nonce_manager
+from fees import fee_oracle
+from batch import decode_call
+from metrics import metrics
+from web3.exceptions import TimeExhausted, TransactionNotFound
+import time
+import asyncio
+
+
+send_locks = {}
+
+
+async def next_nonce(address: str, count: int = 1) -> int:
+    # Shares the nonce sequence of the sync code, the node is only asked once per sender
+    if not nonce_manager.is_synced(address):
+        nonce_manager.seed(address, await async_w3.eth.get_transaction_count(address, 'pending'))
+
+    return nonce_manager.next(address, count)
+
+
+async def wait_for_receipt(tx_hash, timeout: float = None, poll_latency: float = None) -> dict:
+    with metrics.phase('confirm'):
+        return await poll_receipt(
+            tx_hash, timeout or config['receipts']['timeout'], poll_latency or config['receipts']['pollInterval']
+        )
+
+
+async def poll_receipt(tx_hash, timeout: float, poll_latency: float) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return await async_w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            if time.monotonic() > deadline:
+                raise TimeExhausted(f"Transaction {tx_hash.hex()} is not in the chain after {timeout} seconds")
+            await asyncio.sleep(poll_latency)
+
+
+async def send(tx: dict, private_key: str = None) -> bytes:
+    # Fill the missing fields, sign locally and broadcast
+    private_key = private_key or config['owner']['privateKey']
+    sender = w3.eth.account.from_key(private_key).address
+    tx = dict(tx, **{'from': sender})
+    tx.setdefault('value', 0)
+    if 'gas' not in tx:
+        tx['gas'] = await async_w3.eth.estimate_gas(tx)
+    if not {'gasPrice', 'maxFeePerGas'} & set(tx):
+        # The oracle refreshes over the sync provider, in a thread so the event loop keeps running
+        tx.update(await asyncio.get_running_loop().run_in_executor(None, fee_oracle.transaction_fees))
+    tx['chainId'] = config['network']['chainId']
+
+    # Nonces of one sender must reach the node in order
+    async with send_locks.setdefault(sender, asyncio.Lock()):
+        tx['nonce'] = await next_nonce(sender)
+        with metrics.phase('sign'):
+            signed_txn = w3.eth.account.sign_transaction(tx, private_key)
+        try:
+            with metrics.phase('broadcast'):
+                return await async_w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+        except Exception:
+            nonce_manager.resync(sender)
+            raise
+
+
+async def transact(contract_function, private_key: str = None, value: int = 0) -> dict:
+    tx_hash = await send({
+        'to': contract_function.address,
+        'data': contract_function._encode_transaction_data(),
+        'value': value
+    }, private_key)
+
+    return await wait_for_receipt(tx_hash)
+
+
+async def call(contract_function, block_identifier='latest'):
+    result = await async_w3.eth.call({
+        'to': contract_function.address,
+        'data': contract_function._encode_transaction_data()
+    }, block_identifier)
+
+    return decode_call(contract_function, result)
+
+
+async def run(contract_name: str, constructor_args: tuple, contract_file_name: str) -> w3.eth.contract:
+    artifact = get_artifact(contract_name, contract_file_name)
+    deploy_contract = w3.eth.contract(abi=artifact['abi'], bytecode=artifact['bytecode'])
+    with metrics.phase('deploy'):
+        tx_hash = await send({'data': deploy_contract.constructor(*constructor_args)._encode_data_in_transaction()})
+        tx_receipt = await wait_for_receipt(tx_hash)
+
+    # Debugging
+    print_deployment(contract_name, constructor_args, tx_receipt)
+
+    return w3.eth.contract(tx_receipt.contractAddress, abi=artifact['abi'])
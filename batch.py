@@ -0,0 +1,106 @@
+from provider import config, w3
+from web3 import Web3
+from web3._utils.abi import get_abi_output_types, map_abi_data
+from web3._utils.empty import empty
+from web3._utils.method_formatters import receipt_formatter, to_integer_if_hex
+from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
+from web3.datastructures import AttributeDict
+from hexbytes import HexBytes
+from metrics import settings as metrics_settings, metrics, payload_size
+from itertools import count
+import json
+import time
+
+
+request_ids = count()
+
+
+def batch_request(calls: list, web3: Web3 = w3) -> list:
+    # Send many JSON-RPC calls in one HTTP request, responses are returned in call order
+    if not calls:
+        return []
+
+    payload = [
+        {'jsonrpc': '2.0', 'method': method, 'params': params, 'id': next(request_ids)}
+        for method, params in calls
+    ]
+
+    # Large batches are split, nodes reject payloads above their own limit
+    responses = {}
+    max_size = config['batch']['maxSize']
+    for start in range(0, len(payload), max_size):
+        data = json.dumps(payload[start:start + max_size]).encode()
+        started = time.perf_counter()
+        raw_response = web3.provider.post(data)
+        elapsed = time.perf_counter() - started
+        metrics.record_rpc('batch', elapsed, len(data), len(raw_response), False)
+        chunk = json.loads(raw_response)
+        if isinstance(chunk, dict):
+            raise ValueError(chunk.get('error', chunk))
+        responses.update((response['id'], response) for response in chunk)
+
+        # Every call in the batch is counted under its own method too, with the latency of the whole round-trip
+        for request in payload[start:start + max_size] if metrics_settings['enabled'] else ():
+            response = responses.get(request['id'], {})
+            metrics.record_rpc(
+                request['method'], elapsed, payload_size(request['params']), payload_size(response.get('result')),
+                'result' not in response
+            )
+
+    return [responses[request['id']] for request in payload]
+
+
+def block_param(block_identifier) -> str:
+    return hex(block_identifier) if isinstance(block_identifier, int) else block_identifier
+
+
+def decode_call(contract_function, result: bytes, web3: Web3 = w3):
+    # Decode the same way ContractFunction.call() does
+    output_types = get_abi_output_types(contract_function.abi)
+    output_data = map_abi_data(BASE_RETURN_NORMALIZERS, output_types, web3.codec.decode_abi(output_types, result))
+
+    return output_data[0] if len(output_data) == 1 else output_data
+
+
+def format_receipt(result: dict) -> AttributeDict:
+    return AttributeDict.recursive(receipt_formatter(result)) if result else None
+
+
+class Batch:
+    def __init__(self, web3: Web3 = w3):
+        self.w3 = web3
+        self._calls = []
+        self._decoders = []
+
+    def call(self, contract_function, block_identifier='latest'):
+        tx = {'to': contract_function.address, 'data': contract_function._encode_transaction_data()}
+        if self.w3.eth.default_account is not empty:
+            tx['from'] = self.w3.eth.default_account
+        self._calls.append(('eth_call', [tx, block_param(block_identifier)]))
+        self._decoders.append(lambda result: decode_call(contract_function, HexBytes(result), self.w3))
+
+        return self
+
+    def get_transaction_receipt(self, tx_hash):
+        self._calls.append(('eth_getTransactionReceipt', [HexBytes(tx_hash).hex()]))
+        self._decoders.append(format_receipt)
+
+        return self
+
+    def get_balance(self, address: str, block_identifier='latest'):
+        self._calls.append(('eth_getBalance', [Web3.toChecksumAddress(address), block_param(block_identifier)]))
+        self._decoders.append(to_integer_if_hex)
+
+        return self
+
+    def execute(self) -> list:
+        # Results come back decoded and in the order the requests were added
+        calls, decoders = self._calls, self._decoders
+        self._calls, self._decoders = [], []
+        results = []
+        for (method, params), decoder, response in zip(calls, decoders, batch_request(calls, self.w3)):
+            if 'error' in response:
+                raise ValueError(f"{method} failed: {response['error']}")
+            results.append(decoder(response['result']))
+
+        return results
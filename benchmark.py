@@ -0,0 +1,109 @@
+from provider import config, w3
+from deploy import deploy_artifact
+import compile
+import os
+import sys
+
+
+def variant_name(optimizer: dict) -> str:
+    return f"runs-{optimizer['runs']}" if optimizer['enabled'] else 'disabled'
+
+
+def build_variant(optimizer: dict) -> dict:
+    # Compile every contract with the given optimizer settings into its own directory
+    artifacts = {}
+    for contract_name in config['contracts']:
+        files = compile.resolve_files(contract_name)
+        sources = compile.build_sources(contract_name, files)
+        build_dir = os.path.join('build', 'benchmark', variant_name(optimizer), contract_name)
+        os.makedirs(build_dir, exist_ok=True)
+        compiled_sol = compile.compile_sources(build_dir, sources, optimizer)
+        artifacts[contract_name] = compile.write_artifact(contract_name, next(iter(files)), compiled_sol, build_dir)
+
+    return artifacts
+
+
+def gas_used(function_call, sender: str) -> int:
+    tx_hash = function_call.transact({'from': sender})
+    return w3.eth.wait_for_transaction_receipt(tx_hash).gasUsed
+
+
+def run_workload(artifacts: dict) -> dict:
+    # Deploy
+    owner = config['owner']['publicKey']
+    users = w3.eth.accounts[1:]
+    results = {}
+    contracts = {}
+    for name, contract_name in (('token', 'WalletikaToken'), ('reward', 'WalletikaToken'),
+                                ('staking', 'StakingRewards'), ('wns', 'WNSProtocol')):
+        artifact = artifacts[contract_name]
+        tx_receipt = deploy_artifact(artifact, ())
+        contracts[name] = w3.eth.contract(tx_receipt.contractAddress, abi=artifact['abi'])
+        if name != 'reward':
+            results[f"{contract_name} deploy"] = tx_receipt.gasUsed
+            results[f"{contract_name} bytecode size"] = len(w3.eth.get_code(tx_receipt.contractAddress))
+    token, reward, staking, wns = (contracts[name] for name in ('token', 'reward', 'staking', 'wns'))
+    amount = 1000 * 10 ** 18
+
+    # WalletikaToken
+    results['transfer'] = gas_used(token.functions.transfer(users[0], amount), owner)
+    results[f"transferMultiple ({len(users)})"] = gas_used(
+        token.functions.transferMultiple(users, [amount] * len(users)), owner
+    )
+
+    # StakingRewards
+    start_block = w3.eth.block_number + 1
+    gas_used(staking.functions.initialize(
+        token.address, reward.address, 10 ** 18, start_block, start_block + 1000, 0, False, owner
+    ), owner)
+    gas_used(reward.functions.transfer(staking.address, amount), owner)
+    gas_used(token.functions.approve(staking.address, amount), owner)
+    results['deposit'] = gas_used(staking.functions.deposit(amount), owner)
+    results['getReward'] = gas_used(staking.functions.getReward(), owner)
+    results['withdraw'] = gas_used(staking.functions.withdraw(amount), owner)
+
+    # WNSProtocol
+    usernames = ['walletika%s' % index for index in range(1, len(users) + 1)]
+    records = [gas_used(wns.functions.newRecord(username), user) for username, user in zip(usernames, users)]
+    results['newRecord (max)'] = max(records)
+    results[f"setMultiVerified ({len(usernames)})"] = gas_used(
+        wns.functions.setMultiVerified(usernames, [True] * len(usernames)), owner
+    )
+
+    return results
+
+
+def print_table(reports: dict):
+    variants = list(reports)
+    rows = list(reports[variants[0]])
+    first_width = max(len(row) for row in rows)
+    widths = [max(len(variant), 12) for variant in variants]
+
+    print(' | '.join([''.ljust(first_width)] + [v.rjust(w) for v, w in zip(variants, widths)]))
+    print('-+-'.join(['-' * first_width] + ['-' * w for w in widths]))
+    for row in rows:
+        print(' | '.join([row.ljust(first_width)] + [
+            f"{reports[v][row]:,}".rjust(w) for v, w in zip(variants, widths)
+        ]))
+
+
+def run(optimizers: list) -> dict:
+    compile.resolve_solc()
+    reports = {}
+    for optimizer in optimizers:
+        name = variant_name(optimizer)
+        print(f"[ + ] Benchmarking {name}")
+        reports[name] = run_workload(build_variant(optimizer))
+
+    print_table(reports)
+
+    return reports
+
+
+if sys.argv[0] == __file__:
+    # Optimizer runs can be passed as arguments, "0" stands for a disabled optimizer
+    if sys.argv[1:]:
+        optimizers = [{'enabled': int(runs) > 0, 'runs': int(runs) or 200} for runs in sys.argv[1:]]
+    else:
+        optimizers = config['benchmark']['optimizer']
+    run(optimizers)
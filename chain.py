@@ -0,0 +1,45 @@
+from provider import config, w3
+from nonces import nonce_manager
+from read_cache import read_cache
+from batch import batch_request
+import gas_report
+import unittest
+
+
+def snapshot():
+    return w3.manager.request_blocking('evm_snapshot', [])
+
+
+def revert(snapshot_id):
+    # Local state that follows the chain is dropped together with the reverted blocks
+    gas_report.flush()
+    w3.manager.request_blocking('evm_revert', [snapshot_id])
+    nonce_manager.reset()
+    read_cache.clear()
+
+
+def increase_time(seconds: int) -> int:
+    # Moves the clock of the next mined block forward
+    return w3.manager.request_blocking('evm_increaseTime', [seconds])
+
+
+def mine(blocks: int = 1):
+    # Every block is its own evm_mine, all of them sent in one batch request
+    for response in batch_request([('evm_mine', [])] * blocks):
+        if 'error' in response:
+            raise ValueError(response['error'])
+
+
+def mine_to(block_number: int):
+    mine(max(block_number - w3.eth.block_number, 0))
+
+
+class SnapshotTestCase(unittest.TestCase):
+    # Every test starts from the state left by the module deployment, so tests run in any order
+    def setUp(self):
+        self.snapshot_id = snapshot()
+        w3.eth.default_account = config['owner']['publicKey']
+
+    def tearDown(self):
+        revert(self.snapshot_id)
+        w3.eth.default_account = config['owner']['publicKey']
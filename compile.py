@@ -1,60 +1,320 @@
 from solcx import compile_standard, install_solc
+from solcx.install import get_executable
+from solcx.exceptions import SolcNotInstalled
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from metrics import metrics
 import os
 import sys
 import json
+import time
+import hashlib
+import re
+import shutil
+import subprocess
+
+
+config = json.load(open('config.json'))
+import_pattern = re.compile(r'''^\s*import\s+(?:[^'"]*?\s+from\s+)?['"]([^'"]+)['"]''')
+imports_cache_path = os.path.join('build', 'imports.json')
+toolchain_cache_path = os.path.join('build', 'solc.json')
 
 
 def editor(line: str) -> str:
-    if line.startswith('import') and '@' not in line:
-        line = "import './%s';\n" % os.path.basename(
-            line.replace("import ", '').replace("'", '').replace('"', '').replace(";", '').strip()
-        )
+    match = import_pattern.match(line)
+    if match and '@' not in match.group(1):
+        line = line[:match.start(1)] + './' + os.path.basename(match.group(1)) + line[match.end(1):]
 
     return line
 
 
-def run():
-    # Validation
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def solc_candidates(version: str) -> list:
+    toolchain = config['compiler'].get('toolchain', {})
+    candidates = []
+    if toolchain.get('path'):
+        candidates.append(toolchain['path'])
+    for install_dir in (toolchain.get('cacheDir'), None):
+        try:
+            candidates.append(str(get_executable(version, install_dir)))
+        except SolcNotInstalled:
+            pass
+    system_solc = shutil.which('solc')
+    if system_solc:
+        output = subprocess.run([system_solc, '--version'], capture_output=True, text=True).stdout
+        if f"Version: {version}+" in output:
+            candidates.append(system_solc)
+
+    return candidates
+
+
+@lru_cache(maxsize=None)
+def resolve_solc() -> str:
+    version = config['compilerVersion']
+    toolchain = config['compiler'].get('toolchain', {})
+    expected_sha256 = toolchain.get('sha256')
+
+    # Reuse the binary verified by a previous run while it and the configured toolchain are unchanged
+    try:
+        with open(toolchain_cache_path) as file:
+            cached = json.load(file)
+        stat = os.stat(cached['path'])
+        if cached['version'] == version and [stat.st_size, stat.st_mtime] == cached['stat'] and (
+                expected_sha256 in (None, cached['sha256'])) and (
+                [toolchain.get('path'), toolchain.get('cacheDir')] == cached['toolchain']):
+            return cached['path']
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+
+    # Look for a local binary first, downloading is the last resort
+    candidates = solc_candidates(version)
+    if not candidates:
+        if toolchain.get('offline'):
+            raise FileNotFoundError(f"solc {version} is not installed and the toolchain is offline")
+        install_solc(version=version)
+        candidates = solc_candidates(version)
+
+    path = candidates[0]
+    sha256 = file_sha256(path)
+    if expected_sha256 not in (None, sha256):
+        raise ValueError(f"{path} checksum {sha256} does not match {expected_sha256}")
+
+    stat = os.stat(path)
+    os.makedirs('build', exist_ok=True)
+    with open(toolchain_cache_path, 'w') as file:
+        json.dump({
+            'version': version, 'path': path, 'stat': [stat.st_size, stat.st_mtime], 'sha256': sha256,
+            'toolchain': [toolchain.get('path'), toolchain.get('cacheDir')]
+        }, file)
+
+    return path
+
+
+def parse_imports(path: str, content: str) -> list:
+    imports = []
+    for line in content.splitlines():
+        match = import_pattern.match(line)
+        if match is None or match.group(1).startswith('@'):
+            continue
+        target = match.group(1)
+        if target.startswith('.'):
+            target = os.path.join(os.path.dirname(path), target)
+        imports.append(os.path.normpath(target).replace(os.sep, '/'))
+
+    return imports
+
+
+def resolve_files(contract_name: str) -> dict:
+    # Explicit file lists are still supported
+    entry = config['contracts'][contract_name]
+    if isinstance(entry, dict):
+        return entry
+
     try:
-        contract_name = sys.argv[1]
-        contract_files = config['contracts'][contract_name]
-    except (IndexError, KeyError):
-        raise KeyError("Unexpected Parameters EX: compile.py ContractName")
+        with open(imports_cache_path) as file:
+            cache = json.load(file)
+    except (FileNotFoundError, ValueError):
+        cache = {}
+
+    # Walk the import graph from the entry file, only changed files are parsed again
+    files = {}
+    stack = [(os.path.normpath(entry).replace(os.sep, '/'), contract_name)]
+    while stack:
+        path, importer = stack.pop()
+        name = os.path.basename(path)
+        if files.get(name) == path:
+            continue
+        if name in files:
+            raise ValueError(f"{name} refers to both {files[name]} and {path}")
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"{path} imported by {importer} does not exist")
+
+        with open(path, 'rb') as file:
+            content = file.read()
+        file_hash = hashlib.sha256(content).hexdigest()
+        if cache.get(path, {}).get('hash') != file_hash:
+            cache[path] = {'hash': file_hash, 'imports': parse_imports(path, content.decode())}
+
+        files[name] = path
+        stack.extend((target, path) for target in reversed(cache[path]['imports']))
+
+    os.makedirs('build', exist_ok=True)
+    with open(imports_cache_path + '.%s' % os.getpid(), 'w') as file:
+        json.dump(cache, file)
+    os.replace(imports_cache_path + '.%s' % os.getpid(), imports_cache_path)
+
+    return files
 
-    # Initialize
+
+def build_key(sources: dict, settings: dict) -> str:
+    digest = hashlib.sha256()
+    digest.update(config['compilerVersion'].encode())
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    for name in sorted(sources):
+        digest.update(name.encode())
+        digest.update(hashlib.sha256(sources[name]['content'].encode()).digest())
+
+    return digest.hexdigest()
+
+
+def build_sources(contract_name: str, files: dict) -> dict:
     build_dir = os.path.join('build', contract_name)
     os.makedirs(build_dir, exist_ok=True)
     sources = {}
 
     # Build sol files
-    for name, path in contract_files.items():
-        sources.update({name: {'content': ''}})
+    for name, path in files.items():
         with open(os.path.abspath(path), 'r') as reader:
-            with open(os.path.join(build_dir, name), 'w') as writer:
-                for line in reader.readlines():
-                    line = editor(line)
-                    writer.write(line)
-                    sources[name]['content'] += line
+            content = ''.join(editor(line) for line in reader)
+        with open(os.path.join(build_dir, name), 'w') as writer:
+            writer.write(content)
+        sources.update({name: {'content': content}})
+
+    return sources
+
+
+def compile_sources(build_dir: str, sources: dict, optimizer: dict = None) -> dict:
+    # Skip solc when the sources, compiler and settings did not change
+    optimizer = optimizer or config['compiler']['optimizer']
+    settings = {
+        'optimizer': {
+            'enabled': optimizer['enabled'],
+            'runs': optimizer['runs']
+        },
+        'outputSelection': {'*': {'*': ['abi', 'metadata', 'evm.bytecode', 'evm.sourceMap']}}
+    }
+    key = build_key(sources, settings)
+    compiled_path = os.path.join(build_dir, 'compiled.json')
+    key_path = os.path.join(build_dir, 'compiled.key')
+    if os.path.isfile(compiled_path) and os.path.isfile(key_path):
+        with open(key_path) as file:
+            if file.read().strip() == key:
+                print(f"[ + ] {build_dir} is up to date")
+                with open(compiled_path) as compiled:
+                    return json.load(compiled)
 
     # Compile all contracts to "compiled.json" file
-    with open(os.path.join(build_dir, 'compiled.json'), 'w') as file:
-        optimizer = config['compiler']['optimizer']
-        compiled_sol = compile_standard({
-            'language': 'Solidity',
-            'sources': sources,
-            'settings': {
-                'optimizer': {
-                    'enabled': optimizer['enabled'],
-                    'runs': optimizer['runs']
-                },
-                'outputSelection': {'*': {'*': ['abi', 'metadata', 'evm.bytecode', 'evm.sourceMap']}}
-            }},
-            solc_version=config['compilerVersion']
-        )
+    compiled_sol = compile_standard({
+        'language': 'Solidity',
+        'sources': sources,
+        'settings': settings
+    }, solc_binary=resolve_solc())
+    with open(compiled_path, 'w') as file:
         json.dump(compiled_sol, file)
+    with open(key_path, 'w') as file:
+        file.write(key)
+
+    return compiled_sol
+
+
+def write_artifact(contract_name: str, source_name: str, compiled_sol: dict, build_dir: str = None) -> dict:
+    # Keep only what deploy.py needs from the deployable contract
+    contract = compiled_sol['contracts'][source_name][contract_name]
+    abi = contract['abi']
+    bytecode = contract['evm']['bytecode']['object']
+    content_hash = hashlib.sha256((json.dumps(abi, sort_keys=True) + bytecode).encode()).hexdigest()
+    artifact = {
+        'contractName': contract_name,
+        'sourceName': source_name,
+        'abi': abi,
+        'bytecode': bytecode,
+        'hash': content_hash
+    }
+    build_dir = build_dir or os.path.join('build', contract_name)
+    with open(os.path.join(build_dir, 'artifact.json'), 'w') as file:
+        json.dump(artifact, file, separators=(',', ':'))
+
+    return artifact
+
+
+def run(contract_name: str) -> float:
+    started = time.perf_counter()
+    files = resolve_files(contract_name)
+    sources = build_sources(contract_name, files)
+    compiled_sol = compile_sources(os.path.join('build', contract_name), sources)
+    write_artifact(contract_name, next(iter(files)), compiled_sol)
+    elapsed = time.perf_counter() - started
+    metrics.record_phase('compile', elapsed)
+
+    return elapsed
+
+
+def run_shared(contract_names: list) -> float:
+    # Merge the sources of all contracts, shared files must point to the same path
+    started = time.perf_counter()
+    paths = {}
+    sources = {}
+    files = {}
+    for contract_name in contract_names:
+        files[contract_name] = resolve_files(contract_name)
+        for name, path in files[contract_name].items():
+            if paths.setdefault(name, path) != path:
+                raise ValueError(f"{name} refers to both {paths[name]} and {path}")
+        sources.update(build_sources(contract_name, files[contract_name]))
+
+    # Compile once, then split the output into per contract artifacts
+    build_dir = os.path.join('build', 'shared')
+    os.makedirs(build_dir, exist_ok=True)
+    compiled_sol = compile_sources(build_dir, sources)
+    for contract_name in contract_names:
+        names = files[contract_name]
+
+        # The split output is not what a per contract compile makes, a later run must not take it as up to date
+        key_path = os.path.join('build', contract_name, 'compiled.key')
+        if os.path.isfile(key_path):
+            os.remove(key_path)
+        with open(os.path.join('build', contract_name, 'compiled.json'), 'w') as file:
+            json.dump({
+                'errors': compiled_sol.get('errors', []),
+                'sources': {name: compiled_sol['sources'][name] for name in names},
+                'contracts': {name: compiled_sol['contracts'][name] for name in names}
+            }, file)
+        write_artifact(contract_name, next(iter(names)), compiled_sol)
+    elapsed = time.perf_counter() - started
+    metrics.record_phase('compile', elapsed)
+
+    return elapsed
+
+
+def run_many(contract_names: list) -> dict:
+    # Compile each contract in its own process, the total time is bounded by the slowest one
+    timings = {}
+    with ProcessPoolExecutor(max_workers=min(len(contract_names), os.cpu_count() or 1)) as executor:
+        futures = {executor.submit(run, name): name for name in contract_names}
+        for future in as_completed(futures):
+            name = futures[future]
+            timings[name] = future.result()
+            metrics.record_phase('compile', timings[name])
+            print(f"[ + ] {name} compiled in {timings[name]:.2f}s")
+
+    return timings
 
 
 if __name__ == '__main__':
-    config = json.load(open('config.json'))
-    install_solc(version=config['compilerVersion'])
-    run()
+    # Validation
+    names = sys.argv[1:]
+    shared = '--shared' in names
+    if shared:
+        names.remove('--shared')
+    if names == ['all']:
+        names = list(config['contracts'])
+    if not names or any(name not in config['contracts'] for name in names):
+        raise KeyError("Unexpected Parameters EX: compile.py [--shared] ContractName [ContractName ...] | all")
+
+    resolve_solc()
+    started = time.perf_counter()
+    if shared:
+        print(f"[ + ] {', '.join(names)} compiled in {run_shared(names):.2f}s")
+    elif len(names) == 1:
+        print(f"[ + ] {names[0]} compiled in {run(names[0]):.2f}s")
+    else:
+        run_many(names)
+    print(f"[ + ] Total build time {time.perf_counter() - started:.2f}s")
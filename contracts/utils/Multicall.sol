@@ -0,0 +1,52 @@
+// SPDX-License-Identifier: MIT
+
+pragma solidity 0.6.12;
+pragma experimental ABIEncoderV2;
+
+/**
+ * @dev Aggregates many read-only calls into one, so every result is read
+ * at the same block.
+ *
+ * Each call is made with `staticcall`, the aggregator can not change state.
+ */
+contract Multicall {
+    struct Call {
+        address target;
+        bytes callData;
+    }
+
+    struct Result {
+        bool success;
+        bytes returnData;
+    }
+
+    /**
+     * @dev Returns the current block number and the raw return data of every call.
+     *
+     * Requirements:
+     *
+     * - every call must succeed.
+     */
+    function aggregate(Call[] memory calls) public view returns (uint256 blockNumber, bytes[] memory returnData) {
+        blockNumber = block.number;
+        returnData = new bytes[](calls.length);
+        for (uint256 i = 0; i < calls.length; i++) {
+            (bool success, bytes memory result) = calls[i].target.staticcall(calls[i].callData);
+            require(success, "Multicall: call failed");
+            returnData[i] = result;
+        }
+    }
+
+    /**
+     * @dev Same as {aggregate}, but a failed call is reported in its result
+     * instead of reverting the whole aggregate.
+     */
+    function tryAggregate(Call[] memory calls) public view returns (uint256 blockNumber, Result[] memory results) {
+        blockNumber = block.number;
+        results = new Result[](calls.length);
+        for (uint256 i = 0; i < calls.length; i++) {
+            (bool success, bytes memory result) = calls[i].target.staticcall(calls[i].callData);
+            results[i] = Result(success, result);
+        }
+    }
+}
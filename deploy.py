@@ -1,48 +1,184 @@
 from provider import config, w3
+from nonces import nonce_manager
+from fees import fee_oracle
+from receipts import receipt_waiter
+from metrics import metrics
+from functools import lru_cache
+from concurrent.futures import TimeoutError
+import gas_report
 import os
 import sys
 import json
+import hashlib
+import time
 
 
-def run(contract_name: str, constructor_args: tuple, contract_file_name: str) -> w3.eth.contract:
-    # Initialize
+@lru_cache(maxsize=None)
+def load_artifact(contract_name: str) -> dict:
+    with open(os.path.join('build', contract_name, 'artifact.json')) as file:
+        return json.load(file)
+
+
+def sign_deployment(artifact: dict, constructor_args: tuple, nonce: int, fees: dict):
     public_key = config['owner']['publicKey']
     private_key = config['owner']['privateKey']
-    build_dir = os.path.join('build', contract_name)
-    with open(os.path.join(build_dir, 'compiled.json')) as file:
-        compiled_sol = json.load(file)['contracts'][contract_file_name][contract_name]
-        abi = compiled_sol['abi']
-        bytecode = compiled_sol['evm']['bytecode']['object']
+    deploy_contract = w3.eth.contract(abi=artifact['abi'], bytecode=artifact['bytecode'])
+    data = deploy_contract.constructor(*constructor_args).buildTransaction(dict(fees, **{
+        'from': public_key, 'chainId': config['network']['chainId']
+    }))
+    data.update({'nonce': nonce})
+
+    return w3.eth.account.sign_transaction(data, private_key)
+
+
+def deploy_artifact(artifact: dict, constructor_args: tuple) -> dict:
+    # Initialize
+    public_key = config['owner']['publicKey']
 
     # Deploy
     w3.eth.default_account = public_key
-    deploy_contract = w3.eth.contract(abi=abi, bytecode=bytecode)
-    data = deploy_contract.constructor(*constructor_args).buildTransaction({
-        'from': public_key, 'gasPrice': w3.eth.gasPrice
-    })
-    data.update({'nonce': w3.eth.get_transaction_count(public_key)})
-    signed_txn = w3.eth.account.sign_transaction(data, private_key)
-    tx_hash = w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-    tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-    token_contract = w3.eth.contract(tx_receipt.contractAddress, abi=abi)
+    with metrics.phase('deploy'):
+        with nonce_manager.reserve(public_key) as nonce:
+            with metrics.phase('sign'):
+                signed_txn = sign_deployment(artifact, constructor_args, nonce, fee_oracle.transaction_fees())
+            with metrics.phase('broadcast'):
+                tx_hash = w3.eth.send_raw_transaction(signed_txn.rawTransaction)
 
-    # Debugging
+        with metrics.phase('confirm'):
+            try:
+                return receipt_waiter.wait(tx_hash, config['receipts']['timeout'])
+            except TimeoutError:
+                # A dropped transaction leaves a gap, the next nonce is fetched from the node again
+                nonce_manager.resync(public_key)
+                raise
+
+
+def print_deployment(contract_name: str, constructor_args: tuple, tx_receipt: dict):
     print(f"""
     Contract Name: {contract_name}
     Constructor Args: {constructor_args}
     -------------
-    Owner: {w3.eth.default_account}
-    TX Hash: {tx_hash.hex()}
+    Owner: {tx_receipt['from']}
+    TX Hash: {tx_receipt.transactionHash.hex()}
     Contract Address: {tx_receipt.contractAddress}
     """)
 
+
+def get_artifact(contract_name: str, contract_file_name: str) -> dict:
+    artifact = load_artifact(contract_name)
+    if artifact['sourceName'] != contract_file_name:
+        raise ValueError(f"{contract_name} is built from {artifact['sourceName']}, not {contract_file_name}")
+
+    return artifact
+
+
+def manifest_path() -> str:
+    return os.path.join('build', 'deployments', f"{config['network']['chainId']}.json")
+
+
+def load_manifest() -> dict:
+    try:
+        with open(manifest_path()) as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def deployment_key(contract_name: str, artifact: dict, constructor_args: tuple) -> str:
+    # The creation data covers both the bytecode and the encoded constructor args
+    deploy_contract = w3.eth.contract(abi=artifact['abi'], bytecode=artifact['bytecode'])
+    data = deploy_contract.constructor(*constructor_args)._encode_data_in_transaction()
+
+    return f"{contract_name}:{hashlib.sha256(data.encode()).hexdigest()}"
+
+
+def find_deployment(contract_name: str, artifact: dict, constructor_args: tuple):
+    # A recorded address is only trusted while it still holds the same runtime code
+    deployment = load_manifest().get(deployment_key(contract_name, artifact, constructor_args))
+    if deployment and w3.keccak(w3.eth.get_code(deployment['address'])).hex() == deployment['codeHash']:
+        return w3.eth.contract(deployment['address'], abi=artifact['abi'])
+
+
+def record_deployment(contract_name: str, artifact: dict, constructor_args: tuple, tx_receipt: dict):
+    manifest = load_manifest()
+    manifest[deployment_key(contract_name, artifact, constructor_args)] = {
+        'contractName': contract_name,
+        'address': tx_receipt.contractAddress,
+        'transactionHash': tx_receipt.transactionHash.hex(),
+        'codeHash': w3.keccak(w3.eth.get_code(tx_receipt.contractAddress)).hex()
+    }
+    # Written aside and swapped in, parallel workers on the same chain never read a half written file
+    os.makedirs(os.path.dirname(manifest_path()), exist_ok=True)
+    with open(manifest_path() + '.%s' % os.getpid(), 'w') as file:
+        json.dump(manifest, file, indent=4)
+    os.replace(manifest_path() + '.%s' % os.getpid(), manifest_path())
+
+
+def run(contract_name: str, constructor_args: tuple, contract_file_name: str, reuse: bool = False) -> w3.eth.contract:
+    artifact = get_artifact(contract_name, contract_file_name)
+    if reuse:
+        token_contract = find_deployment(contract_name, artifact, constructor_args)
+        if token_contract is not None:
+            gas_report.register(contract_name, token_contract)
+            print(f"""
+    Contract Name: {contract_name}
+    Constructor Args: {constructor_args}
+    -------------
+    Reused Contract Address: {token_contract.address}
+    """)
+            return token_contract
+
+    tx_receipt = deploy_artifact(artifact, constructor_args)
+    token_contract = w3.eth.contract(tx_receipt.contractAddress, abi=artifact['abi'])
+    gas_report.register(contract_name, token_contract)
+    if reuse:
+        record_deployment(contract_name, artifact, constructor_args, tx_receipt)
+
+    # Debugging
+    print_deployment(contract_name, constructor_args, tx_receipt)
+
     return token_contract
 
 
+def run_batch(deployments: dict) -> dict:
+    # Sign every deployment with consecutive nonces and broadcast them all before waiting
+    public_key = config['owner']['publicKey']
+    w3.eth.default_account = public_key
+    fees = fee_oracle.transaction_fees()
+    tx_hashes = {}
+    started = time.perf_counter()
+    with nonce_manager.reserve(public_key, len(deployments)) as nonce:
+        for index, (name, (contract_name, constructor_args, contract_file_name)) in enumerate(deployments.items()):
+            artifact = get_artifact(contract_name, contract_file_name)
+            with metrics.phase('sign'):
+                signed_txn = sign_deployment(artifact, constructor_args, nonce + index, fees)
+            with metrics.phase('broadcast'):
+                tx_hashes[name] = w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+
+    # One waiter polls the receipts of the whole batch once per block
+    with metrics.phase('confirm'):
+        futures = {name: receipt_waiter.submit(tx_hash) for name, tx_hash in tx_hashes.items()}
+        try:
+            receipts = {name: future.result(config['receipts']['timeout']) for name, future in futures.items()}
+        except TimeoutError:
+            nonce_manager.resync(public_key)
+            raise
+    metrics.record_phase('deploy', time.perf_counter() - started)
+
+    contracts = {}
+    for name, (contract_name, constructor_args, contract_file_name) in deployments.items():
+        abi = get_artifact(contract_name, contract_file_name)['abi']
+        contracts[name] = w3.eth.contract(receipts[name].contractAddress, abi=abi)
+        gas_report.register(contract_name, contracts[name])
+        print_deployment(contract_name, constructor_args, receipts[name])
+
+    return contracts
+
+
 if sys.argv[0] == __file__:
     try:
-        contract = run(sys.argv[1], eval(sys.argv[2]), sys.argv[3])
+        contract = run(sys.argv[1], eval(sys.argv[2]), sys.argv[3], reuse='--reuse' in sys.argv[4:])
     except IndexError:
         raise IndexError(
-            """Unexpected Parameters EX: deploy.py ContractName "('ConstructorArgs1')" FileName.sol"""
+            """Unexpected Parameters EX: deploy.py ContractName "('ConstructorArgs1')" FileName.sol [--reuse]"""
         )
@@ -0,0 +1,72 @@
+from provider import config, w3
+from read_cache import read_cache
+from threading import Lock
+from web3 import Web3
+
+
+class FeeOracle:
+    def __init__(self, web3: Web3, settings: dict, head):
+        self.w3 = web3
+        self.settings = settings
+        self.head = head
+        self._lock = Lock()
+        self._fees = None
+        self._block_number = None
+        self._legacy = False
+
+    def _fetch(self) -> dict:
+        try:
+            history = self.w3.eth.fee_history(
+                self.settings['blocks'], 'latest', [self.settings['priorityPercentile']]
+            )
+        except ValueError:
+            # Nodes without EIP-1559 support only get a legacy price, from now on without asking again
+            self._legacy = True
+            return {'gasPrice': self.w3.eth.gas_price}
+
+        # The last base fee is the one of the next block
+        base_fee = history['baseFeePerGas'][-1]
+        if not base_fee:
+            self._legacy = True
+            return {'gasPrice': self.w3.eth.gas_price}
+
+        rewards = sorted(reward[0] for reward in history['reward'])
+        priority_fee = max(rewards[len(rewards) // 2] if rewards else 0, self.settings['minPriorityFee'])
+
+        return {
+            'maxPriorityFeePerGas': priority_fee,
+            'maxFeePerGas': base_fee * self.settings['baseFeeMultiplier'] + priority_fee
+        }
+
+    def transaction_fees(self) -> dict:
+        # A legacy price costs one call either way, asking for the head first would only add one
+        if self._legacy:
+            return {'gasPrice': self.w3.eth.gas_price}
+
+        # Fees only change with a new block, so eth_feeHistory is read once per head block
+        block_number = self.head()
+        with self._lock:
+            if self._fees is None or block_number != self._block_number:
+                self._fees = self._fetch()
+                self._block_number = block_number
+
+            return dict(self._fees)
+
+
+# The head is the one the read cache tracks, an eth_blockNumber is cheaper than an eth_feeHistory
+fee_oracle = FeeOracle(w3, config['fees'], read_cache.head)
+
+
+def fee_middleware(make_request, web3):
+    # Node signed transactions are priced by the oracle too
+    def middleware(method, params):
+        if method == 'eth_sendTransaction' and not {'gasPrice', 'maxFeePerGas'} & set(params[0]):
+            fees = {key: hex(value) for key, value in fee_oracle.transaction_fees().items()}
+            params = [dict(params[0], **fees)] + list(params[1:])
+
+        return make_request(method, params)
+
+    return middleware
+
+
+w3.middleware_onion.add(fee_middleware, 'fees')
@@ -0,0 +1,146 @@
+from provider import config, w3
+from statistics import mean
+import os
+import sys
+import json
+import atexit
+
+
+contracts = {}
+transactions = []
+samples = {}
+settings = config['gasReport']
+
+
+def gas_middleware(make_request, web3):
+    def middleware(method, params):
+        response = make_request(method, params)
+        if method in ('eth_sendTransaction', 'eth_sendRawTransaction') and 'result' in response:
+            transactions.append(response['result'])
+
+        return response
+
+    return middleware
+
+
+def register(contract_name: str, contract):
+    contracts[contract.address] = (contract_name, contract)
+
+
+def flush():
+    # Sent transactions are resolved now, a chain revert would drop them before the report is written
+    while transactions:
+        tx_hash = transactions.pop(0)
+        tx = w3.eth.get_transaction(tx_hash)
+        tx_receipt = w3.eth.get_transaction_receipt(tx_hash)
+        if tx.to is None and tx_receipt.contractAddress in contracts:
+            name = f"{contracts[tx_receipt.contractAddress][0]}.constructor"
+        elif tx.to in contracts:
+            contract_name, contract = contracts[tx.to]
+            try:
+                function, _ = contract.decode_function_input(tx.input)
+            except ValueError:
+                continue
+            name = f"{contract_name}.{function.fn_name}"
+        else:
+            continue
+        samples.setdefault(name, []).append(tx_receipt.gasUsed)
+
+
+def collect() -> dict:
+    # Resolve every sent transaction to the contract function it called
+    flush()
+
+    return {
+        name: {'calls': len(values), 'min': min(values), 'max': max(values), 'mean': round(mean(values))}
+        for name, values in sorted(samples.items())
+    }
+
+
+def write(report_name: str):
+    os.makedirs(settings['directory'], exist_ok=True)
+    with open(os.path.join(settings['directory'], f"{report_name}.json"), 'w') as file:
+        json.dump(collect(), file, indent=4)
+
+
+def enable(report_name: str):
+    # Every test process under run_tests.py keeps its own report, a worker runs many of them, load_reports merges them
+    if os.environ.get('WALLETIKA_WORKER'):
+        report_name = f"{report_name}-{os.environ['WALLETIKA_WORKER']}-{os.getpid()}"
+    w3.middleware_onion.add(gas_middleware, 'gas_report')
+    atexit.register(write, report_name)
+
+
+def load_reports() -> dict:
+    # Merge the reports written by each test module
+    report = {}
+    if not os.path.isdir(settings['directory']):
+        return report
+    for file_name in sorted(os.listdir(settings['directory'])):
+        if file_name.endswith('.json'):
+            with open(os.path.join(settings['directory'], file_name)) as file:
+                for name, stats in json.load(file).items():
+                    if name in report:
+                        calls = report[name]['calls'] + stats['calls']
+                        stats = {
+                            'calls': calls,
+                            'min': min(report[name]['min'], stats['min']),
+                            'max': max(report[name]['max'], stats['max']),
+                            'mean': round(
+                                (report[name]['mean'] * report[name]['calls'] + stats['mean'] * stats['calls']) / calls
+                            )
+                        }
+                    report[name] = stats
+
+    return report
+
+
+def print_report(report: dict, baseline: dict):
+    print(f"{'Function':<40} {'Calls':>6} {'Min':>10} {'Max':>10} {'Mean':>10} {'Baseline':>10} {'Change':>8}")
+    for name, stats in report.items():
+        base = baseline.get(name, {}).get('mean')
+        change = f"{(stats['mean'] - base) / base * 100:+.2f}%" if base else '-'
+        print(
+            f"{name:<40} {stats['calls']:>6} {stats['min']:>10} {stats['max']:>10} {stats['mean']:>10} "
+            f"{base or '-':>10} {change:>8}"
+        )
+
+
+def check(report: dict, baseline: dict) -> tuple:
+    # Functions without a baseline are reported too, a new call is not a free pass
+    regressions = []
+    missing = []
+    for name, stats in report.items():
+        base = baseline.get(name, {}).get('mean')
+        if not base:
+            missing.append(name)
+        elif (stats['mean'] - base) / base * 100 > settings['threshold']:
+            regressions.append(name)
+
+    return regressions, missing
+
+
+if sys.argv[0] == __file__:
+    report = load_reports()
+    if not report:
+        sys.exit(f"[ - ] No gas reports in {settings['directory']}, run the tests first")
+    if '--update-baseline' in sys.argv[1:]:
+        with open(settings['baseline'], 'w') as file:
+            json.dump(report, file, indent=4)
+        print(f"[ + ] Baseline updated: {settings['baseline']}")
+        sys.exit()
+
+    try:
+        with open(settings['baseline']) as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        sys.exit(f"[ - ] No baseline at {settings['baseline']}, run with --update-baseline to create it")
+
+    print_report(report, baseline)
+    regressions, missing = check(report, baseline)
+    if missing:
+        print(f"[ - ] Not in the baseline, run with --update-baseline to add them: {', '.join(missing)}")
+    if regressions:
+        print(f"[ - ] Gas regressions above {settings['threshold']}%: {', '.join(regressions)}")
+    if regressions or missing:
+        sys.exit(1)
@@ -0,0 +1,275 @@
+from provider import config, w3
+from deploy import run_batch
+from fees import fee_oracle
+from receipts import receipt_waiter
+from batch import batch_request
+from eth_account import Account
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from statistics import mean
+from web3 import Web3
+from web3._utils.method_formatters import to_integer_if_hex
+import os
+import sys
+import json
+import math
+import time
+import random
+
+settings = config['loadTest']
+unit = 10 ** 18
+
+
+def wait_all(tx_hashes: list) -> list:
+    futures = [receipt_waiter.submit(tx_hash) for tx_hash in tx_hashes]
+    receipts = [future.result(config['receipts']['timeout']) for future in futures]
+    if any(receipt.status == 0 for receipt in receipts):
+        raise ValueError("Load test setup transaction reverted")
+
+    return receipts
+
+
+def choose_senders(count: int) -> list:
+    # Senders are the node's unlocked accounts, the owner only funds them
+    owner = config['owner']['publicKey']
+    senders = [account for account in w3.eth.accounts if account != owner][:count]
+    if len(senders) < count:
+        raise ValueError(f"Only {len(senders)} unlocked accounts are available for {count} senders")
+
+    return senders
+
+
+def prepare(senders: list) -> dict:
+    # Deploy
+    owner = config['owner']['publicKey']
+    contracts = run_batch({
+        'token': ("WalletikaToken", (), "Token.sol"),
+        'reward': ("WalletikaToken", (), "Token.sol"),
+        'staking': ("StakingRewards", (), "StakingRewards.sol"),
+        'wns': ("WNSProtocol", (), "WNSProtocol.sol")
+    })
+    token, reward, staking = contracts['token'], contracts['reward'], contracts['staking']
+
+    # Pool without a user limit or lock, so deposits and withdrawals never wait on the reward period
+    start_block = w3.eth.block_number + 1
+    wait_all([
+        staking.functions.initialize(
+            token.address, reward.address, unit, start_block, start_block + 10 ** 9, 0, False, owner
+        ).transact({'from': owner}),
+        reward.functions.transfer(staking.address, settings['senderTokens'] * unit).transact({'from': owner}),
+        token.functions.transferMultiple(
+            senders, [settings['senderTokens'] * unit] * len(senders)
+        ).transact({'from': owner})
+    ])
+
+    # Every sender starts with a stake, withdrawals take a token at a time out of it
+    wait_all([
+        token.functions.approve(staking.address, 2 ** 256 - 1).transact({'from': sender}) for sender in senders
+    ])
+    wait_all([
+        staking.functions.deposit(settings['senderTokens'] * unit // 2).transact({'from': sender})
+        for sender in senders
+    ])
+
+    # WNS takes one record per address, so every newRecord is sent from a funded key of its own
+    accounts = [Account.create() for _ in range(settings['recordAccounts'] if 'newRecord' in settings['mix'] else 0)]
+    wait_all([
+        w3.eth.send_transaction({
+            'from': owner, 'to': account.address, 'value': Web3.toWei(settings['recordFunding'], 'ether')
+        })
+        for account in accounts
+    ])
+    contracts['recordAccounts'] = accounts
+
+    return contracts
+
+
+def record_transaction(wns, account) -> bytes:
+    # Usernames are capped at 40 characters
+    transaction = wns.functions.newRecord(account.address[2:38].lower()).buildTransaction(
+        dict(fee_oracle.transaction_fees(), **{
+            'from': account.address, 'nonce': 0, 'chainId': config['network']['chainId']
+        })
+    )
+
+    return account.sign_transaction(transaction).rawTransaction
+
+
+def percentile(values: list, rank: float) -> float:
+    # Nearest rank, values are sorted
+    if not values:
+        return 0
+
+    return values[max(math.ceil(rank / 100 * len(values)) - 1, 0)]
+
+
+def block_stats(first_block: int, last_block: int) -> dict:
+    responses = batch_request([
+        ('eth_getBlockByNumber', [hex(number), False]) for number in range(first_block, last_block + 1)
+    ])
+    blocks = [response['result'] for response in responses if response.get('result')]
+    gas_used = [to_integer_if_hex(block['gasUsed']) for block in blocks]
+    gas_limit = [to_integer_if_hex(block['gasLimit']) for block in blocks]
+
+    return {
+        'blocks': len(blocks),
+        'transactionsPerBlock': round(mean(len(block['transactions']) for block in blocks), 2) if blocks else 0,
+        'gasPerBlock': round(mean(gas_used)) if blocks else 0,
+        'maxGasPerBlock': max(gas_used, default=0),
+        'gasLimitUsage': round(sum(gas_used) / sum(gas_limit) * 100, 2) if blocks else 0
+    }
+
+
+def run(duration: float, concurrency: int, sender_count: int) -> dict:
+    # A sender belongs to one worker, two threads on one account would measure the client's nonce ordering
+    if concurrency > sender_count:
+        raise ValueError(f"Concurrency {concurrency} needs at least as many senders, got {sender_count}")
+
+    senders = choose_senders(sender_count)
+    contracts = prepare(senders)
+    token, staking, wns = contracts['token'], contracts['staking'], contracts['wns']
+    record_accounts = contracts['recordAccounts']
+    recipients = [Account.create().address for _ in range(settings['recipients'])]
+
+    operations = {
+        'transfer': lambda: token.functions.transfer(random.choice(recipients), unit),
+        'transferMultiple': lambda: token.functions.transferMultiple(recipients, [unit] * len(recipients)),
+        'deposit': lambda: staking.functions.deposit(unit),
+        'withdraw': lambda: staking.functions.withdraw(unit)
+    }
+    mix = {name: weight for name, weight in settings['mix'].items() if weight}
+    if any(name not in operations and name != 'newRecord' for name in mix):
+        raise KeyError(f"Unexpected operation EX: {' | '.join(list(operations) + ['newRecord'])}")
+
+    lock = Lock()
+    results = {name: {'sent': 0, 'failed': 0, 'errors': {}, 'latency': []} for name in mix}
+
+    def next_operation(sender: str):
+        with lock:
+            # newRecord drops out of the mix once its keys are used up
+            names = [name for name in mix if name != 'newRecord' or record_accounts]
+            if not names:
+                return None, None
+            name = random.choices(names, [mix[name] for name in names])[0]
+            if name == 'newRecord':
+                return name, record_accounts.pop()
+
+            return name, sender
+
+    def submit(name: str, sender) -> tuple:
+        # The clock starts once the transaction is built, gas estimation is not part of the latency
+        if name == 'newRecord':
+            raw_transaction = record_transaction(wns, sender)
+            started = time.perf_counter()
+            return w3.eth.send_raw_transaction(raw_transaction), started
+        transaction = operations[name]().buildTransaction({'from': sender})
+        started = time.perf_counter()
+
+        return w3.eth.send_transaction(transaction), started
+
+    def worker(deadline: float, worker_sender: str):
+        # Each worker keeps one transaction in flight, so concurrency is the number of open transactions
+        while time.monotonic() < deadline:
+            name, sender = next_operation(worker_sender)
+            if name is None:
+                return
+            error = None
+            latency = None
+            try:
+                tx_hash, started = submit(name, sender)
+                receipt = receipt_waiter.wait(tx_hash, config['receipts']['timeout'])
+                latency = time.perf_counter() - started
+                if receipt.status == 0:
+                    error = 'reverted'
+            except Exception as exception:
+                # Kept by type, a failure that hits every call is a setup problem and not load
+                error = type(exception).__name__
+            with lock:
+                results[name]['sent'] += 1
+                if error:
+                    results[name]['failed'] += 1
+                    results[name]['errors'][error] = results[name]['errors'].get(error, 0) + 1
+                if latency is not None:
+                    results[name]['latency'].append(latency)
+
+    print(f"[ + ] Load test for {duration}s, {concurrency} in flight from {len(senders)} senders")
+    first_block = w3.eth.block_number + 1
+    started = time.perf_counter()
+    deadline = time.monotonic() + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker, deadline, sender) for sender in senders[:concurrency]]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    return report(results, elapsed, block_stats(first_block, w3.eth.block_number))
+
+
+def report(results: dict, elapsed: float, blocks: dict) -> dict:
+    ranks = settings['percentiles']
+    sent = sum(result['sent'] for result in results.values())
+    failed = sum(result['failed'] for result in results.values())
+    latencies = sorted(latency for result in results.values() for latency in result['latency'])
+    summary = {
+        'elapsed': round(elapsed, 2),
+        'sent': sent,
+        'failed': failed,
+        'failureRate': round(failed / sent * 100, 2) if sent else 0,
+        'tps': round((sent - failed) / elapsed, 2),
+        'latency': {f"p{rank}": round(percentile(latencies, rank), 4) for rank in ranks},
+        'operations': {},
+        'blocks': blocks
+    }
+    for name, result in results.items():
+        values = sorted(result['latency'])
+        summary['operations'][name] = {
+            'sent': result['sent'],
+            'failed': result['failed'],
+            'failureRate': round(result['failed'] / result['sent'] * 100, 2) if result['sent'] else 0,
+            'errors': result['errors'],
+            'latency': {f"p{rank}": round(percentile(values, rank), 4) for rank in ranks}
+        }
+
+    print_report(summary)
+    os.makedirs(settings['directory'], exist_ok=True)
+    with open(os.path.join(settings['directory'], f"{time.strftime('%Y%m%d-%H%M%S')}.json"), 'w') as file:
+        json.dump(summary, file, indent=4)
+
+    return summary
+
+
+def print_report(summary: dict):
+    headers = ['sent', 'failed', 'fail %'] + [f"{rank} ms" for rank in summary['latency']]
+    rows = dict(summary['operations'], total=summary)
+    first_width = max(len(row) for row in rows)
+    widths = [max(len(header), 8) for header in headers]
+
+    print(' | '.join([''.ljust(first_width)] + [h.rjust(w) for h, w in zip(headers, widths)]))
+    print('-+-'.join(['-' * first_width] + ['-' * w for w in widths]))
+    for row, result in rows.items():
+        values = [f"{result['sent']:,}", f"{result['failed']:,}", f"{result['failureRate']}"] + [
+            f"{latency * 1000:,.1f}" for latency in result['latency'].values()
+        ]
+        print(' | '.join([row.ljust(first_width)] + [v.rjust(w) for v, w in zip(values, widths)]))
+
+    for row, result in summary['operations'].items():
+        if result['errors']:
+            errors = ', '.join(f"{error} x{count}" for error, count in result['errors'].items())
+            print(f"[ - ] {row} failures: {errors}")
+
+    blocks = summary['blocks']
+    print(f"""
+    TPS: {summary['tps']} over {summary['elapsed']}s
+    Blocks: {blocks['blocks']} ({blocks['transactionsPerBlock']} transactions per block)
+    Gas Per Block: {blocks['gasPerBlock']:,} (max {blocks['maxGasPerBlock']:,}, {blocks['gasLimitUsage']}% of the limit)
+    """)
+
+
+if sys.argv[0] == __file__:
+    # Duration, concurrency and senders can be passed as arguments, the rest comes from config.json
+    try:
+        duration = float(sys.argv[1]) if sys.argv[1:] else settings['duration']
+        concurrency = int(sys.argv[2]) if sys.argv[2:] else settings['concurrency']
+        sender_count = int(sys.argv[3]) if sys.argv[3:] else settings['senders']
+    except ValueError:
+        raise ValueError("Unexpected Parameters EX: loadtest.py [duration] [concurrency] [senders]")
+    run(duration, concurrency, sender_count)
@@ -0,0 +1,175 @@
+from contextlib import contextmanager
+from threading import Lock
+import os
+import sys
+import json
+import time
+import atexit
+
+config = json.load(open('config.json'))
+settings = config['metrics']
+
+
+class Histogram:
+    def __init__(self, buckets: list):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value: float):
+        for index, bucket in enumerate(self.buckets):
+            if value <= bucket:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def cumulative(self) -> list:
+        total = 0
+        result = []
+        for bucket, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((bucket, total))
+
+        return result
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else 0,
+            'max': round(self.max, 6),
+            'buckets': {str(bucket): count for bucket, count in self.cumulative()}
+        }
+
+
+class Metrics:
+    def __init__(self, buckets: list):
+        self.buckets = buckets
+        self._lock = Lock()
+        self.rpc = {}
+        self.phases = {}
+
+    def record_rpc(self, method: str, seconds: float, request_bytes: int, response_bytes: int, error: bool):
+        with self._lock:
+            stats = self.rpc.get(method)
+            if stats is None:
+                stats = self.rpc[method] = {
+                    'calls': 0, 'errors': 0, 'requestBytes': 0, 'responseBytes': 0, 'latency': Histogram(self.buckets)
+                }
+            stats['calls'] += 1
+            stats['errors'] += int(error)
+            stats['requestBytes'] += request_bytes
+            stats['responseBytes'] += response_bytes
+            stats['latency'].observe(seconds)
+
+    def record_phase(self, name: str, seconds: float):
+        with self._lock:
+            self.phases.setdefault(name, Histogram(self.buckets)).observe(seconds)
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.perf_counter() - started)
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                'rpc': {
+                    method: dict(
+                        {key: value for key, value in stats.items() if key != 'latency'},
+                        latency=stats['latency'].summary()
+                    )
+                    for method, stats in sorted(self.rpc.items())
+                },
+                'phases': {name: histogram.summary() for name, histogram in sorted(self.phases.items())}
+            }
+
+    def prometheus(self) -> str:
+        lines = []
+
+        def histogram_lines(metric: str, label: str, histograms: dict):
+            lines.append(f"# TYPE {metric} histogram")
+            for name, histogram in sorted(histograms.items()):
+                for bucket, count in histogram.cumulative():
+                    lines.append(f'{metric}_bucket{{{label}="{name}",le="{bucket}"}} {count}')
+                lines.append(f'{metric}_bucket{{{label}="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{metric}_sum{{{label}="{name}"}} {histogram.sum}')
+                lines.append(f'{metric}_count{{{label}="{name}"}} {histogram.count}')
+
+        with self._lock:
+            for metric, key in (
+                ('rpc_requests_total', 'calls'),
+                ('rpc_errors_total', 'errors'),
+                ('rpc_request_bytes_total', 'requestBytes'),
+                ('rpc_response_bytes_total', 'responseBytes')
+            ):
+                lines.append(f"# TYPE {metric} counter")
+                for method, stats in sorted(self.rpc.items()):
+                    lines.append(f'{metric}{{method="{method}"}} {stats[key]}')
+            histogram_lines(
+                'rpc_latency_seconds', 'method', {method: stats['latency'] for method, stats in self.rpc.items()}
+            )
+            histogram_lines('phase_duration_seconds', 'phase', self.phases)
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, report_name: str):
+        os.makedirs(settings['directory'], exist_ok=True)
+        with open(os.path.join(settings['directory'], f"{report_name}.json"), 'w') as file:
+            json.dump(self.summary(), file, indent=4)
+        with open(os.path.join(settings['directory'], f"{report_name}.prom"), 'w') as file:
+            file.write(self.prometheus())
+
+
+metrics = Metrics(settings['buckets'])
+
+
+def payload_size(payload) -> int:
+    return len(json.dumps(payload, default=lambda value: dict(value) if hasattr(value, 'items') else str(value)))
+
+
+def metrics_middleware(make_request, web3):
+    def middleware(method, params):
+        started = time.perf_counter()
+        try:
+            response = make_request(method, params)
+        except Exception:
+            metrics.record_rpc(method, time.perf_counter() - started, payload_size(params), 0, True)
+            raise
+        metrics.record_rpc(
+            method, time.perf_counter() - started, payload_size(params), payload_size(response), 'error' in response
+        )
+
+        return response
+
+    return middleware
+
+
+async def async_metrics_middleware(make_request, web3):
+    async def middleware(method, params):
+        started = time.perf_counter()
+        try:
+            response = await make_request(method, params)
+        except Exception:
+            metrics.record_rpc(method, time.perf_counter() - started, payload_size(params), 0, True)
+            raise
+        metrics.record_rpc(
+            method, time.perf_counter() - started, payload_size(params), payload_size(response), 'error' in response
+        )
+
+        return response
+
+    return middleware
+
+
+# Every process writes its own report, named after the script it runs
+if settings['enabled']:
+    report_name = os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'interactive'
+    atexit.register(metrics.write, f"{report_name}-{os.getpid()}")
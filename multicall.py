@@ -0,0 +1,58 @@
+from provider import config, w3
+from batch import decode_call
+from web3 import Web3
+import deploy
+import sys
+
+
+class Multicall:
+    def __init__(self, web3: Web3, settings: dict):
+        self.w3 = web3
+        self.settings = settings
+        self._contract = None
+
+    @property
+    def contract(self):
+        # Uses the configured aggregator, or deploys one once per chain and reuses it from the manifest
+        if self._contract is None:
+            if self.settings['address']:
+                abi = deploy.load_artifact('Multicall')['abi']
+                self._contract = self.w3.eth.contract(self.settings['address'], abi=abi)
+            else:
+                self._contract = deploy.run('Multicall', (), 'Multicall.sol', reuse=True)
+
+        return self._contract
+
+    def aggregate(self, contract_functions: list, block_identifier='latest', require_success: bool = True) -> tuple:
+        # Returns the block number the calls were read at and the decoded results in call order
+        results = []
+        block_number = None
+        max_calls = self.settings['maxCalls']
+        for start in range(0, len(contract_functions), max_calls):
+            chunk = contract_functions[start:start + max_calls]
+            calls = [(function.address, function._encode_transaction_data()) for function in chunk]
+
+            # Later chunks are pinned to the block of the first one
+            if require_success:
+                block_number, return_data = self.contract.functions.aggregate(calls).call(
+                    block_identifier=block_number or block_identifier
+                )
+            else:
+                block_number, outcomes = self.contract.functions.tryAggregate(calls).call(
+                    block_identifier=block_number or block_identifier
+                )
+                return_data = [data if success else None for success, data in outcomes]
+
+            results.extend(
+                decode_call(function, data, self.w3) if data is not None else None
+                for function, data in zip(chunk, return_data)
+            )
+
+        return block_number, results
+
+
+multicall = Multicall(w3, config['multicall'])
+
+
+if sys.argv[0] == __file__:
+    print(f"[ + ] Multicall: {multicall.contract.address}")
@@ -0,0 +1,97 @@
+from provider import w3
+from eth_account import Account
+from contextlib import contextmanager
+from threading import Lock, RLock
+from web3 import Web3
+
+
+class NonceManager:
+    def __init__(self, web3: Web3):
+        self.w3 = web3
+        self._lock = Lock()
+        self._sender_locks = {}
+        self._nonces = {}
+
+    def _sender_lock(self, address: str) -> RLock:
+        with self._lock:
+            return self._sender_locks.setdefault(address, RLock())
+
+    def next(self, address: str, count: int = 1) -> int:
+        # Sync once from the node, then hand out nonces locally
+        address = Web3.toChecksumAddress(address)
+        with self._sender_lock(address):
+            if address not in self._nonces:
+                self._nonces[address] = self.w3.eth.get_transaction_count(address, 'pending')
+            nonce = self._nonces[address]
+            self._nonces[address] += count
+
+        return nonce
+
+    def is_synced(self, address: str) -> bool:
+        return Web3.toChecksumAddress(address) in self._nonces
+
+    def seed(self, address: str, nonce: int):
+        # Used by callers that fetch the nonce themselves, a nonce handed out already is kept
+        address = Web3.toChecksumAddress(address)
+        with self._sender_lock(address):
+            self._nonces.setdefault(address, nonce)
+
+    def resync(self, address: str):
+        # The next nonce is fetched from the node again
+        address = Web3.toChecksumAddress(address)
+        with self._sender_lock(address):
+            self._nonces.pop(address, None)
+
+    def reset(self):
+        # Every sender is synced from the node again, used after the chain is reverted
+        with self._lock:
+            self._nonces.clear()
+
+    @contextmanager
+    def reserve(self, address: str, count: int = 1):
+        # The sender stays locked until the block exits, so its nonces reach the node in order
+        with self._sender_lock(Web3.toChecksumAddress(address)):
+            nonce = self.next(address, count)
+            try:
+                yield nonce
+            except Exception:
+                self.resync(address)
+                raise
+
+
+nonce_manager = NonceManager(w3)
+
+
+def nonce_middleware(make_request, web3):
+    # Transactions signed by the node get their nonce locally too, so both paths share one sequence
+    def resync(method, params):
+        # Raw transactions are only recovered when they failed
+        nonce_manager.resync(
+            params[0]['from'] if method == 'eth_sendTransaction' else Account.recover_transaction(params[0])
+        )
+
+    def send(method, params):
+        try:
+            response = make_request(method, params)
+        except Exception:
+            resync(method, params)
+            raise
+        if 'error' in response:
+            resync(method, params)
+
+        return response
+
+    def middleware(method, params):
+        if method == 'eth_sendTransaction' and 'nonce' not in params[0]:
+            # The sender stays locked through the send, a later nonce can not overtake this one
+            with nonce_manager.reserve(params[0]['from']) as nonce:
+                return send(method, [dict(params[0], nonce=hex(nonce))] + list(params[1:]))
+        if method in ('eth_sendTransaction', 'eth_sendRawTransaction'):
+            return send(method, params)
+
+        return make_request(method, params)
+
+    return middleware
+
+
+w3.middleware_onion.add(nonce_middleware, 'nonces')
@@ -1,9 +1,235 @@
-from web3 import Web3
+from web3 import Web3, HTTPProvider
+from web3.providers.base import JSONBaseProvider
+from web3.providers.async_base import AsyncBaseProvider
+from web3.providers.eth_tester import EthereumTesterProvider
+from web3.eth import AsyncEth
+from aiohttp import ClientTimeout
+from requests.adapters import HTTPAdapter
+from metrics import settings as metrics_settings, metrics_middleware, async_metrics_middleware
+from threading import Lock
+import requests
+import random
+import time
 import json
-
+import os
 
 config = json.load(open('config.json'))
-w3 = Web3(Web3.HTTPProvider(config['network']['rpc']))
 
-if not w3.isConnected():
-    raise ConnectionError("( %s ) Provider is disconnected" % config['network']['rpc'])
+# Test runners point each worker at its own chain without editing config.json
+config['network']['backend'] = os.environ.get('WALLETIKA_BACKEND', config['network']['backend'])
+config['network']['rpc'] = os.environ.get('WALLETIKA_RPC', config['network']['rpc'])
+
+
+class PooledHTTPProvider(HTTPProvider):
+    # One keep-alive pool shared by every thread, web3 itself opens a session per thread
+    def __init__(self, endpoint_uri: str, settings: dict):
+        super().__init__(endpoint_uri, request_kwargs={
+            'timeout': (settings['connectTimeout'], settings['readTimeout'])
+        })
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=settings['poolSize'], max_retries=settings['retries'], pool_block=True
+        )
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._lock = Lock()
+        self._checked = False
+
+    def post(self, data: bytes) -> bytes:
+        response = self.session.post(self.endpoint_uri, data=data, **self.get_request_kwargs())
+        response.raise_for_status()
+
+        return response.content
+
+    def check_connection(self):
+        # The node is asked on first use instead of at import, a failed check is retried next time
+        with self._lock:
+            if self._checked:
+                return
+            self._checked = True
+        if not self.is_connected():
+            self._checked = False
+            raise ConnectionError("( %s ) Provider is disconnected" % self.endpoint_uri)
+
+    def make_request(self, method, params):
+        if not self._checked:
+            self.check_connection()
+
+        return self.decode_rpc_response(self.post(self.encode_rpc_request(method, params)))
+
+
+# Node-local state and everything that touches the sender's nonce stays on the primary
+STICKY_METHODS = {
+    'eth_accounts', 'eth_sendTransaction', 'eth_sendRawTransaction', 'eth_sign', 'eth_signTransaction',
+    'eth_getTransactionCount', 'eth_newFilter', 'eth_newBlockFilter', 'eth_newPendingTransactionFilter',
+    'eth_getFilterChanges', 'eth_getFilterLogs', 'eth_uninstallFilter'
+}
+STICKY_PREFIXES = ('personal_', 'evm_', 'miner_', 'txpool_')
+
+
+def is_sticky(method: str) -> bool:
+    return method in STICKY_METHODS or method.startswith(STICKY_PREFIXES)
+
+
+class BalancedHTTPProvider(JSONBaseProvider):
+    # Reads go to the healthy nodes weighted by their measured latency, writes to the primary
+    def __init__(self, endpoint_uris: list, settings: dict, routing: dict):
+        super().__init__()
+        self.nodes = [PooledHTTPProvider(endpoint_uri, settings) for endpoint_uri in endpoint_uris]
+        self.primary = self.nodes[0]
+        self.endpoint_uri = self.primary.endpoint_uri
+        self.routing = routing
+        self._lock = Lock()
+        self._latency = {}
+        self._ejected_until = {}
+
+    def healthy_nodes(self) -> list:
+        # An ejected node is back in rotation once its ejectSeconds are over
+        now = time.monotonic()
+        with self._lock:
+            return [node for node in self.nodes if self._ejected_until.get(node, 0) <= now]
+
+    def choose(self, exclude: list = ()):
+        nodes = [node for node in self.healthy_nodes() if node not in exclude]
+        if not nodes:
+            raise ConnectionError("( %s ) No healthy provider" % ', '.join(node.endpoint_uri for node in self.nodes))
+
+        # Nodes without a measurement yet get the best weight so they are sampled
+        with self._lock:
+            latencies = [self._latency.get(node) for node in nodes]
+        best = min([latency for latency in latencies if latency is not None], default=1)
+
+        return random.choices(nodes, [1 / (latency or best or 1e-6) for latency in latencies])[0]
+
+    def _measure(self, node, started: float):
+        latency = time.monotonic() - started
+        decay = self.routing['latencyDecay']
+        with self._lock:
+            previous = self._latency.get(node)
+            self._latency[node] = latency if previous is None else previous * (1 - decay) + latency * decay
+
+    def _eject(self, node):
+        with self._lock:
+            self._ejected_until[node] = time.monotonic() + self.routing['ejectSeconds']
+            self._latency.pop(node, None)
+
+    def _route(self, send, sticky: bool):
+        # A failing read is retried on the next node, writes are never sent twice
+        tried = []
+        while True:
+            node = self.primary if sticky else self.choose(tried)
+            started = time.monotonic()
+            try:
+                response = send(node)
+            except OSError:
+                self._eject(node)
+                tried.append(node)
+                if sticky:
+                    raise
+                continue
+            self._measure(node, started)
+
+            return response
+
+    def post(self, data: bytes) -> bytes:
+        # A batch holding a single sticky call, evm_mine for one, goes to the primary as a whole
+        sticky = any(is_sticky(request['method']) for request in json.loads(data))
+
+        return self._route(lambda node: node.post(data), sticky)
+
+    def make_request(self, method, params):
+        return self._route(lambda node: node.make_request(method, params), is_sticky(method))
+
+
+def make_provider(network: dict):
+    if network['backend'] == 'tester':
+        return InProcessProvider(network, config['owner'])
+
+    # Extra endpoints turn on load balancing, the rpc node stays the primary
+    if network['endpoints']:
+        return BalancedHTTPProvider([network['rpc']] + network['endpoints'], network['connection'], network['routing'])
+
+    return PooledHTTPProvider(network['rpc'], network['connection'])
+
+
+class InProcessProvider(EthereumTesterProvider):
+    # An eth-tester chain in this process, funded like the configured network and with the owner as accounts[0]
+    def __init__(self, network: dict, owner: dict):
+        from eth_tester import EthereumTester, PyEVMBackend
+        from eth_tester.backends.pyevm.main import generate_genesis_state_for_keys, get_default_account_keys
+        from eth_keys import keys
+        from web3.providers.eth_tester.defaults import API_ENDPOINTS, static_return
+
+        account_keys = (keys.PrivateKey(bytes.fromhex(owner['privateKey'].replace('0x', ''))),)
+        account_keys += get_default_account_keys(network['testerAccounts'] - 1)
+        backend = PyEVMBackend(genesis_state=generate_genesis_state_for_keys(account_keys))
+        backend.account_keys = account_keys
+        type(backend.chain).chain_id = network['chainId']
+
+        api_endpoints = dict(API_ENDPOINTS)
+        api_endpoints['eth'] = dict(API_ENDPOINTS['eth'], chainId=static_return(hex(network['chainId'])))
+        api_endpoints['evm'] = dict(API_ENDPOINTS['evm'], increaseTime=self.increase_time)
+        super().__init__(EthereumTester(backend), api_endpoints)
+        self.endpoint_uri = 'tester://in-process'
+        self._lock = Lock()
+        self._request = None
+
+    @staticmethod
+    def increase_time(ethereum_tester, params) -> int:
+        # Same as Ganache, the offset applies to the next mined block. eth-tester's time_travel mines one
+        # at once, so the pending header is moved instead and the block count stays the same on both backends
+        seconds = int(params[0], 16) if isinstance(params[0], str) else params[0]
+        chain = ethereum_tester.backend.chain
+        chain.header = chain.header.copy(timestamp=chain.header.timestamp + seconds)
+
+        return seconds
+
+    def make_request(self, method, params):
+        # eth-tester is not thread safe, the receipt waiter polls from its own thread
+        with self._lock:
+            return super().make_request(method, params)
+
+    def request(self, method, params):
+        # Runs through the tester middlewares, the same way a Web3 instance would send it
+        if self._request is None:
+            self._request = self.request_func(Web3(self), ())
+
+        return self._request(method, params)
+
+    def post(self, data: bytes) -> bytes:
+        # Batches run one by one, there is no round-trip to save
+        responses = []
+        for request in json.loads(data):
+            try:
+                response = dict(self.request(request['method'], request['params']))
+            except Exception as error:
+                response = {'error': {'code': -32000, 'message': str(error)}}
+            responses.append(dict(response, jsonrpc='2.0', id=request['id']))
+
+        return json.dumps(responses, default=lambda value: value.hex() if hasattr(value, 'hex') else dict(value)).encode()
+
+
+class AsyncInProcessProvider(AsyncBaseProvider):
+    def __init__(self, provider: InProcessProvider):
+        self.provider = provider
+
+    async def make_request(self, method, params):
+        return self.provider.request(method, params)
+
+
+def make_async_provider(endpoint_uri: str, settings: dict) -> Web3.AsyncHTTPProvider:
+    return Web3.AsyncHTTPProvider(endpoint_uri, request_kwargs={
+        'timeout': ClientTimeout(sock_connect=settings['connectTimeout'], sock_read=settings['readTimeout'])
+    })
+
+
+w3 = Web3(make_provider(config['network']))
+async_w3 = Web3(
+    AsyncInProcessProvider(w3.provider) if config['network']['backend'] == 'tester'
+    else make_async_provider(config['network']['rpc'], config['network']['connection']),
+    modules={'eth': (AsyncEth,)}, middlewares=[]
+)
+
+if metrics_settings['enabled']:
+    w3.middleware_onion.add(metrics_middleware, 'metrics')
+    async_w3.middleware_onion.add(async_metrics_middleware, 'metrics')
@@ -0,0 +1,97 @@
+from provider import config, w3
+from collections import OrderedDict
+from threading import Lock
+from web3 import Web3
+import time
+
+
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+
+
+class ReadCache:
+    def __init__(self, web3: Web3, settings: dict):
+        self.w3 = web3
+        self.settings = settings
+        self.immutable = set(settings['immutable'])
+        self._lock = Lock()
+        self._entries = OrderedDict()
+        self._head = None
+        self._head_fetched_at = 0
+        self.hits = 0
+        self.misses = 0
+
+    def head(self) -> int:
+        # The head is asked at most once per headRefreshSeconds, older blocks are dropped when it advances.
+        # Above 0 'latest' can lag that long behind the node, even behind the caller's own confirmed transaction
+        with self._lock:
+            if self._head is None or time.monotonic() - self._head_fetched_at >= self.settings['headRefreshSeconds']:
+                head = self.w3.eth.block_number
+                self._head_fetched_at = time.monotonic()
+                if head != self._head:
+                    self._head = head
+                    for key in [key for key in self._entries if key[0] is not None and key[0] < head]:
+                        del self._entries[key]
+
+            return self._head
+
+    def _lookup(self, key, count_miss: bool = True):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+            self.misses += int(count_miss)
+
+            return False, None
+
+    def _put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.settings['maxSize']:
+                self._entries.popitem(last=False)
+
+    def call(self, contract_function, block_identifier='latest'):
+        # Immutable getters are read once, whatever the block, so a hit does not need the head
+        call_key = (contract_function.address, contract_function._encode_transaction_data())
+        immutable = contract_function.fn_name in self.immutable
+        if immutable:
+            found, value = self._lookup((None,) + call_key, count_miss=False)
+            if found:
+                return value
+
+        block_number = self.head() if block_identifier == 'latest' else block_identifier
+        if not isinstance(block_number, int):
+            return contract_function.call(block_identifier=block_number)
+        found, value = self._lookup((block_number,) + call_key)
+        if found:
+            return value
+
+        value = contract_function.call(block_identifier=block_number)
+
+        # A getter still unset before initialization is only kept for this block
+        if immutable and value not in (0, '', ZERO_ADDRESS):
+            self._put((None,) + call_key, value)
+        else:
+            self._put((block_number,) + call_key, value)
+
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.hits + self.misses
+
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / requests, 4) if requests else 0
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._head = None
+
+
+read_cache = ReadCache(w3, config['readCache'])
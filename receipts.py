@@ -0,0 +1,120 @@
+from provider import config, w3
+from batch import batch_request, format_receipt
+from concurrent.futures import Future, TimeoutError
+from threading import Lock, Thread
+from web3 import Web3
+from web3.datastructures import AttributeDict
+from hexbytes import HexBytes
+import time
+
+
+class ReceiptWaiter:
+    def __init__(self, web3: Web3, poll_interval: float, timeout: float):
+        self.w3 = web3
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._lock = Lock()
+        self._pending = {}
+        self._deadlines = {}
+        self._submitted = set()
+        self._thread = None
+
+    def submit(self, tx_hash, timeout: float = None) -> Future:
+        # The future fails with a TimeoutError once its deadline passes, so nothing is polled forever
+        tx_hash = HexBytes(tx_hash).hex()
+        deadline = time.monotonic() + (timeout or self.timeout)
+        with self._lock:
+            future = self._pending.get(tx_hash)
+            if future is None:
+                future = self._pending[tx_hash] = Future()
+                future.add_done_callback(lambda done: self._discard(tx_hash, done))
+                self._submitted.add(tx_hash)
+            self._deadlines[tx_hash] = max(self._deadlines.get(tx_hash, 0), deadline)
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name='receipt-waiter', daemon=True)
+                self._thread.start()
+
+        return future
+
+    def wait(self, tx_hash, timeout: float = None) -> AttributeDict:
+        future = self.submit(tx_hash, timeout)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            # A receipt that is being resolved right now can not be cancelled, it is returned instead
+            if not future.cancel():
+                return future.result()
+            raise
+
+    def _discard(self, tx_hash: str, future: Future):
+        # Cancelled futures leave the pending set, resolved ones were taken out by the poll
+        with self._lock:
+            if self._pending.get(tx_hash) is future:
+                del self._pending[tx_hash]
+                self._deadlines.pop(tx_hash, None)
+
+    def _take(self, tx_hash: str):
+        with self._lock:
+            self._deadlines.pop(tx_hash, None)
+            future = self._pending.pop(tx_hash, None)
+
+        return future if future is not None and future.set_running_or_notify_cancel() else None
+
+    def _poll(self, tx_hashes: list):
+        # One batch request per new block covers every pending transaction
+        responses = batch_request([('eth_getTransactionReceipt', [tx_hash]) for tx_hash in tx_hashes], self.w3)
+        for tx_hash, response in zip(tx_hashes, responses):
+            if 'error' in response:
+                error = ValueError(response['error'])
+            elif response.get('result'):
+                error = None
+            else:
+                continue
+            future = self._take(tx_hash)
+            if future is None:
+                continue
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(format_receipt(response['result']))
+
+    def _expire(self, error: Exception = None):
+        # A failing node is retried until each transaction's own deadline, then the last error is reported
+        now = time.monotonic()
+        with self._lock:
+            tx_hashes = [tx_hash for tx_hash, deadline in self._deadlines.items() if deadline <= now]
+        for tx_hash in tx_hashes:
+            future = self._take(tx_hash)
+            if future is not None:
+                future.set_exception(error or TimeoutError(f"Transaction {tx_hash} has no receipt in time"))
+
+    def _run(self):
+        last_block = None
+        while True:
+            with self._lock:
+                tx_hashes = list(self._pending)
+                if not tx_hashes:
+                    self._thread = None
+                    return
+                submitted, self._submitted = self._submitted, set()
+
+            try:
+                # A new block polls every pending transaction, in between only new submissions are asked for,
+                # a reverted chain can repeat a height
+                block_number = self.w3.eth.block_number
+                if block_number != last_block:
+                    self._poll(tx_hashes)
+                    last_block = block_number
+                elif submitted:
+                    self._poll([tx_hash for tx_hash in tx_hashes if tx_hash in submitted])
+                error = None
+            except Exception as exception:
+                error = exception
+                with self._lock:
+                    self._submitted |= submitted
+            self._expire(error)
+
+            time.sleep(self.poll_interval)
+
+
+receipt_waiter = ReceiptWaiter(w3, config['receipts']['pollInterval'], config['receipts']['timeout'])
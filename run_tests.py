@@ -0,0 +1,129 @@
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+import os
+import sys
+import ast
+import json
+import time
+import glob
+import shlex
+import shutil
+import socket
+import subprocess
+
+
+config = json.load(open('config.json'))
+settings = config['testRunner']
+test_dir = 'test'
+
+
+def discover(pattern: str = '*_unittesting.py') -> dict:
+    # Read the test names from the source, importing a module would deploy its contracts
+    modules = {}
+    for path in sorted(glob.glob(os.path.join(test_dir, pattern))):
+        with open(path) as file:
+            tree = ast.parse(file.read())
+        module = os.path.splitext(os.path.basename(path))[0]
+        modules[module] = [
+            f"{module}.{node.name}.{item.name}"
+            for node in tree.body if isinstance(node, ast.ClassDef)
+            for item in node.body if isinstance(item, ast.FunctionDef) and item.name.startswith('test')
+        ]
+
+    return modules
+
+
+def wait_for_port(port: int, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Node on port {port} did not start in {timeout} seconds")
+
+
+class Worker:
+    # One chain per worker, in this worker's test process or as a node on its own port
+    def __init__(self, index: int):
+        self.index = index
+        self.node = None
+        self.env = dict(os.environ, WALLETIKA_WORKER=str(index), PYTHONPATH=os.getcwd())
+        if settings['nodeCommand']:
+            port = settings['basePort'] + index
+            self.node = subprocess.Popen(
+                shlex.split(settings['nodeCommand'].format(port=port)),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            wait_for_port(port, settings['nodeTimeout'])
+            self.env.update(WALLETIKA_BACKEND='http', WALLETIKA_RPC=f"http://127.0.0.1:{port}")
+        else:
+            self.env.update(WALLETIKA_BACKEND='tester')
+
+    def run(self, tests: list) -> tuple:
+        started = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, '-m', 'unittest'] + tests,
+            cwd=test_dir, env=self.env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        )
+
+        return process.returncode == 0, time.perf_counter() - started, process.stdout
+
+    def stop(self):
+        if self.node is not None:
+            self.node.terminate()
+            self.node.wait()
+
+
+def run(jobs: list, workers: int) -> bool:
+    # A worker is taken from the queue for each job, so a chain is only used by one job at a time
+    workers = [Worker(index) for index in range(min(workers, len(jobs)))]
+    idle = Queue()
+    for worker in workers:
+        idle.put(worker)
+
+    def run_job(tests: list) -> tuple:
+        worker = idle.get()
+        try:
+            return worker.run(tests)
+        finally:
+            idle.put(worker)
+
+    passed = True
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=len(workers)) as executor:
+            for tests, (success, elapsed, output) in zip(jobs, executor.map(run_job, jobs)):
+                print(f"[ {'+' if success else '-'} ] {tests[0]} {'passed' if success else 'failed'} in {elapsed:.2f}s")
+                if not success:
+                    print(output)
+                passed = passed and success
+    finally:
+        for worker in workers:
+            worker.stop()
+    print(f"[ + ] Total test time {time.perf_counter() - started:.2f}s on {len(workers)} workers")
+
+    return passed
+
+
+if __name__ == '__main__':
+    # Validation
+    args = sys.argv[1:]
+    by_case = '--cases' in args
+    if by_case:
+        args.remove('--cases')
+    modules = discover()
+    names = args or list(modules)
+    if any(name not in modules for name in names):
+        raise KeyError(f"Unexpected Parameters EX: run_tests.py [--cases] [{' | '.join(modules)} ...]")
+
+    # A module is one job by default, with --cases every test runs on a fresh deployment of its own
+    if by_case:
+        jobs = [[test] for name in names for test in modules[name]]
+    else:
+        jobs = [[name] for name in names]
+    # Reports left by earlier runs would be merged into this one
+    shutil.rmtree(config['gasReport']['directory'], ignore_errors=True)
+    if not run(jobs, settings['workers'] or os.cpu_count() or 1):
+        sys.exit(1)
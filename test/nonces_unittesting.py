@@ -0,0 +1,106 @@
+import os
+import unittest
+os.chdir('..')
+
+
+# Configuration
+threads = 8
+senders_count = 2
+sends_per_thread = 20
+debugging = True
+
+
+# Deployment
+from provider import w3
+from nonces import nonce_manager
+from chain import SnapshotTestCase
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+
+def function_name(text: str):
+    print(f"[ + ] Start for: {text}")
+
+
+# Testing
+class MyTestCase(SnapshotTestCase):
+    def test1_concurrent_senders(self):
+        function_name('concurrent_senders')
+
+        # Settings
+        senders = w3.eth.accounts[1:senders_count + 1]
+        nonces_before = [w3.eth.get_transaction_count(sender) for sender in senders]
+
+        # Task
+        def send_many(index: int) -> list:
+            # Threads share the senders, so every sender is used by several threads at once
+            sender = senders[index % len(senders)]
+            errors = []
+            for _ in range(sends_per_thread):
+                try:
+                    w3.eth.send_transaction({'from': sender, 'to': sender, 'value': 1})
+                except Exception as error:
+                    errors.append(error)
+
+            return errors
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            errors = [error for result in executor.map(send_many, range(threads)) for error in result]
+        nonces_after = [w3.eth.get_transaction_count(sender) for sender in senders]
+
+        # Debugging
+        if debugging:
+            print(f"""
+            errors: {len(errors)} {errors[:3]}
+            nonces_before: {nonces_before}
+            nonces_after: {nonces_after}
+            """)
+
+        # Test
+        self.assertEqual(errors, [])
+        for before, after in zip(nonces_before, nonces_after):
+            self.assertEqual(after - before, threads // senders_count * sends_per_thread)
+
+    def test2_resync_after_failed_send(self):
+        function_name('resync_after_failed_send')
+
+        # Settings
+        sender = w3.eth.accounts[1]
+
+        # Task
+        # Gas is given, so the node rejects the send itself instead of the estimate
+        with self.assertRaises(Exception):
+            w3.eth.send_transaction({
+                'from': sender, 'to': sender, 'value': w3.eth.get_balance(sender) * 2, 'gas': 21000
+            })
+        synced = nonce_manager.is_synced(sender)
+        tx_hash = w3.eth.send_transaction({'from': sender, 'to': sender, 'value': 1})
+        tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+
+        # Test
+        self.assertFalse(synced)
+        self.assertEqual(tx_receipt.status, 1)
+
+    def test3_reserve_holds_sender(self):
+        function_name('reserve_holds_sender')
+
+        # Settings
+        sender = w3.eth.accounts[1]
+
+        # Task
+        executor = ThreadPoolExecutor(max_workers=1)
+        with nonce_manager.reserve(sender) as nonce:
+            future = executor.submit(nonce_manager.next, sender)
+            time.sleep(0.2)
+            blocked = not future.done()
+        next_nonce = future.result(5)
+        executor.shutdown()
+        nonce_manager.resync(sender)
+
+        # Test
+        self.assertTrue(blocked)
+        self.assertEqual(next_nonce, nonce + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
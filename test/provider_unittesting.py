@@ -0,0 +1,149 @@
+import os
+import unittest
+os.chdir('..')
+
+
+# Configuration
+connection = {'poolSize': 4, 'connectTimeout': 1, 'readTimeout': 2, 'retries': 0}
+routing = {'latencyDecay': 0.5, 'ejectSeconds': 0.5}
+debugging = True
+
+
+# Stand-in nodes
+from provider import BalancedHTTPProvider
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread
+import random
+import json
+import time
+
+
+class StubNode:
+    # Answers every JSON-RPC call with 0x1 after a fixed delay and counts the methods it was sent
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = []
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                requests = payload if isinstance(payload, list) else [payload]
+                node.calls.extend(request['method'] for request in requests)
+                time.sleep(node.delay)
+                responses = [{'jsonrpc': '2.0', 'id': request['id'], 'result': '0x1'} for request in requests]
+                body = json.dumps(responses if isinstance(payload, list) else responses[0]).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.endpoint_uri = f"http://127.0.0.1:{self.server.server_port}"
+        Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def function_name(text: str):
+    print(f"[ + ] Start for: {text}")
+
+
+# Testing
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+        self.nodes = [StubNode(0), StubNode(0), StubNode(0.05)]
+        self.provider = BalancedHTTPProvider([node.endpoint_uri for node in self.nodes], connection, routing)
+
+    def tearDown(self):
+        for node in self.nodes:
+            if node.server.socket.fileno() != -1:
+                node.stop()
+
+    def reads(self, count: int):
+        for _ in range(count):
+            self.provider.make_request('eth_call', [{}, 'latest'])
+
+    def test1_latency_weighted_selection(self):
+        function_name('latency_weighted_selection')
+
+        # Task
+        self.reads(100)
+        fast_calls = self.nodes[1].calls.count('eth_call')
+        slow_calls = self.nodes[2].calls.count('eth_call')
+
+        # Debugging
+        if debugging:
+            print(f"""
+            fast_calls: {fast_calls}
+            slow_calls: {slow_calls}
+            """)
+
+        # Test
+        self.assertGreater(slow_calls, 0)
+        self.assertGreater(fast_calls, slow_calls * 3)
+
+    def test2_eject_and_readmit(self):
+        function_name('eject_and_readmit')
+
+        # Task
+        down = self.nodes[1]
+        down.stop()
+        self.reads(30)
+        healthy = self.provider.healthy_nodes()
+        time.sleep(routing['ejectSeconds'])
+        readmitted = self.provider.healthy_nodes()
+
+        # Debugging
+        if debugging:
+            print(f"""
+            healthy: {[node.endpoint_uri for node in healthy]}
+            readmitted: {[node.endpoint_uri for node in readmitted]}
+            """)
+
+        # Test
+        self.assertNotIn(down.endpoint_uri, [node.endpoint_uri for node in healthy])
+        self.assertEqual(len(healthy), 2)
+        self.assertIn(down.endpoint_uri, [node.endpoint_uri for node in readmitted])
+
+    def test3_writes_stay_on_primary(self):
+        function_name('writes_stay_on_primary')
+
+        # Task
+        for _ in range(20):
+            self.provider.make_request('eth_sendRawTransaction', ['0x00'])
+        self.provider.post(json.dumps([
+            {'jsonrpc': '2.0', 'method': 'evm_mine', 'params': [], 'id': 1}
+        ]).encode())
+        others = self.nodes[1].calls + self.nodes[2].calls
+
+        # Test
+        self.assertEqual(self.nodes[0].calls.count('eth_sendRawTransaction'), 20)
+        self.assertEqual(self.nodes[0].calls.count('evm_mine'), 1)
+        self.assertNotIn('eth_sendRawTransaction', others)
+        self.assertNotIn('evm_mine', others)
+
+    def test4_writes_are_not_retried(self):
+        function_name('writes_are_not_retried')
+
+        # Task
+        self.reads(10)
+        self.nodes[0].stop()
+        with self.assertRaises(OSError):
+            self.provider.make_request('eth_sendRawTransaction', ['0x00'])
+        others = self.nodes[1].calls + self.nodes[2].calls
+
+        # Test
+        self.assertNotIn('eth_sendRawTransaction', others)
+        self.assertNotIn(self.provider.primary, self.provider.healthy_nodes())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,18 +11,38 @@ debugging = True
 
 
 # Deployment
-from deploy import w3, run
-contract = run(contract_name, constructor_args, contract_file_name)
-wtk_token = run("WalletikaToken", constructor_args, "Token.sol")
-tst_token = run("WalletikaToken", constructor_args, "Token.sol")
+from deploy import w3, run_batch
+from chain import SnapshotTestCase, mine_to
+import gas_report
+gas_report.enable('staking_rewards')
+contracts = run_batch({
+    'contract': (contract_name, constructor_args, contract_file_name),
+    'wtk_token': ("WalletikaToken", constructor_args, "Token.sol"),
+    'tst_token': ("WalletikaToken", constructor_args, "Token.sol")
+})
+contract = contracts['contract']
+wtk_token = contracts['wtk_token']
+tst_token = contracts['tst_token']
 
 
 def function_name(text: str):
     print(f"[ + ] Start for: {text}")
 
 
+def initialize_pool():
+    # Same pool as test2_initialize, for tests that need it initialized and funded
+    owner = w3.eth.default_account
+    reward_token_decimal = tst_token.functions.decimals().call()
+    start_block = w3.eth.block_number + 10
+    contract.functions.initialize(
+        wtk_token.address, tst_token.address, 100000 * 10 ** reward_token_decimal, start_block,
+        start_block + 10, 1000 * 10 ** reward_token_decimal, True, owner
+    ).transact()
+    tst_token.functions.transfer(contract.address, 1000000 * 10 ** reward_token_decimal).transact()
+
+
 # Testing
-class MyTestCase(unittest.TestCase):
+class MyTestCase(SnapshotTestCase):
     def test1_initial_details(self):
         function_name('initial_details')
 
@@ -179,6 +199,8 @@ class MyTestCase(unittest.TestCase):
         deposit_amount = 1000 * 10 ** stake_token_decimal
         reward_token_decimal = tst_token.functions.decimals().call()
 
+        initialize_pool()  # initialized pool required
+
         # Task
         start_block = contract.functions.startBlock().call()
         bonus_end_block = contract.functions.bonusEndBlock().call()
@@ -190,7 +212,6 @@ class MyTestCase(unittest.TestCase):
         last_reward_block_after = contract.functions.lastRewardBlock().call()
         total_supply = contract.functions.totalSupply().call()
         my_staked_balance = contract.functions.balanceOf(user_address).call()
-        pending_reward = 0
 
         # Debugging
         if debugging:
@@ -211,29 +232,20 @@ class MyTestCase(unittest.TestCase):
         self.assertLessEqual(last_reward_block, last_reward_block_after)
         self.assertAlmostEqual(my_staked_balance, deposit_amount)
 
-        while w3.eth.block_number <= bonus_end_block:
-            pending_reward = contract.functions.pendingReward(owner).call()
-            self.__add_block()
+        # Mine past the reward period in one batch instead of a transaction per block
+        mine_to(bonus_end_block)
+        pending_reward = contract.functions.pendingReward(owner).call()
 
-            # Debugging
-            if debugging:
-                print(f"""
-                active: {w3.eth.block_number >= start_block}
-                block_number: {w3.eth.block_number}
-                pending_reward: {pending_reward}
-                """)
+        # Debugging
+        if debugging:
+            print(f"""
+            active: {w3.eth.block_number >= start_block}
+            block_number: {w3.eth.block_number}
+            pending_reward: {pending_reward}
+            """)
 
         self.assertAlmostEqual(pending_reward, contract.functions.rewardSupply().call())
 
-    @staticmethod
-    def __add_block():
-        amount = 1 * 10 ** 18
-        w3.eth.send_transaction({
-            'from': w3.eth.default_account,
-            'to': w3.eth.default_account,
-            'value': amount
-        })
-
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,7 +1,6 @@
 from web3 import Web3
 from typing import Union
 import os
-import time
 import unittest
 
 os.chdir('..')
@@ -14,6 +13,12 @@ debugging = True
 
 # Deployment
 from deploy import w3, run
+from nonces import nonce_manager
+from batch import Batch
+from chain import SnapshotTestCase, increase_time, mine
+import gas_report
+
+gas_report.enable('token')
 
 wtk_contract = run(contract_name, constructor_args, contract_file_name)
 
@@ -31,7 +36,7 @@ def to_wei(value: Union[int, float]) -> int:
 
 
 # Testing
-class MyTestCase(unittest.TestCase):
+class MyTestCase(SnapshotTestCase):
     def test1_token_details(self):
         function_name('token_details')
 
@@ -39,16 +44,23 @@ class MyTestCase(unittest.TestCase):
         user2 = w3.eth.accounts[2]
 
         # Task
-        owner = wtk_contract.functions.owner().call()
-        name = wtk_contract.functions.name().call()
-        symbol = wtk_contract.functions.symbol().call()
-        decimals = wtk_contract.functions.decimals().call()
-        total_supply = wtk_contract.functions.totalSupply().call()
-        balance = wtk_contract.functions.balanceOf(user1).call()
-        allowance = wtk_contract.functions.allowance(user2, user1).call()
-        inflation_rate_annually = wtk_contract.functions.inflationRateAnnually().call()
-        inflation_duration_end_date = wtk_contract.functions.inflationDurationEndDate().call()
-        available_to_mint_current_year = wtk_contract.functions.availableToMintCurrentYear().call()
+        (
+            owner, name, symbol, decimals, total_supply, balance, allowance,
+            inflation_rate_annually, inflation_duration_end_date, available_to_mint_current_year
+        ) = (
+            Batch()
+            .call(wtk_contract.functions.owner())
+            .call(wtk_contract.functions.name())
+            .call(wtk_contract.functions.symbol())
+            .call(wtk_contract.functions.decimals())
+            .call(wtk_contract.functions.totalSupply())
+            .call(wtk_contract.functions.balanceOf(user1))
+            .call(wtk_contract.functions.allowance(user2, user1))
+            .call(wtk_contract.functions.inflationRateAnnually())
+            .call(wtk_contract.functions.inflationDurationEndDate())
+            .call(wtk_contract.functions.availableToMintCurrentYear())
+            .execute()
+        )
 
         # Debugging
         if debugging:
@@ -426,25 +438,19 @@ class MyTestCase(unittest.TestCase):
             )
 
             if available_to_mint_expected == 0:
-                current_time = time.time()
+                # Jump to the end of the inflation duration instead of waiting for it
                 inflation_duration_end_date = wtk_contract.functions.inflationDurationEndDate().call()
-                inflation_duration = (inflation_duration_end_date - current_time) + 1
-                print(f"""
-                [ + ] Please wait {inflation_duration} seconds to start a new duration of mint cycle
-                Current Time: {time.ctime()}
-                Renew Mint Time: {time.ctime(inflation_duration_end_date)}
-                """)
+                inflation_duration = inflation_duration_end_date - w3.eth.get_block('latest').timestamp + 1
+                increase_time(inflation_duration)
+                mine()
 
-                '''time.sleep(inflation_duration)
-                # Do transaction to update block.timestamp
-                wtk_contract.functions.transfer(owner, to_wei(10)).transact()
                 available_to_mint = wtk_contract.functions.availableToMintCurrentYear().call()
                 available_to_mint_expected = to_wei(
                     to_ether(wtk_contract.functions.totalSupply().call()) * 5 / 100
                 )
                 amount = to_wei(to_ether(available_to_mint) / mint_times)
 
-                self.assertEqual(available_to_mint, available_to_mint_expected)'''
+                self.assertEqual(available_to_mint, available_to_mint_expected)
 
     def test_11_recover_token(self):
         function_name('recover_token')
@@ -538,7 +544,10 @@ class MyTestCase(unittest.TestCase):
         function_name('renounce_ownership')
 
         # Settings
-        w3.eth.default_account = w3.eth.accounts[2]
+        new_owner = w3.eth.accounts[2]
+
+        wtk_contract.functions.transferOwnership(new_owner).transact()  # transfer ownership required
+        w3.eth.default_account = new_owner  # Switch to new owner account
 
         # Task
         owner = wtk_contract.functions.owner().call()
@@ -563,7 +572,7 @@ class MyTestCase(unittest.TestCase):
             'to': tx_data['to'],
             'value': tx_data['value'],
             'data': tx_data['data'],
-            'nonce': w3.eth.get_transaction_count(w3.eth.default_account),
+            'nonce': nonce_manager.next(w3.eth.default_account),
             'gasPrice': w3.eth.gas_price
         }
         tx.update({'gas': w3.eth.estimate_gas(tx)})
@@ -12,6 +12,9 @@ debugging = True
 
 # Deployment
 from deploy import w3, run
+from chain import SnapshotTestCase
+import gas_report
+gas_report.enable('wns')
 contract = run(contract_name, constructor_args, contract_file_name)
 
 
@@ -38,7 +41,7 @@ def function_name(text: str):
 
 
 # Testing
-class MyTestCase(unittest.TestCase):
+class MyTestCase(SnapshotTestCase):
     def test_initial_details(self):
         function_name('initial_details')
 